@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 import dj_database_url
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -94,17 +95,82 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # WAL lets readers run alongside a writer; the other pragmas trade
+            # a little durability on power loss for much faster local writes
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA temp_store=MEMORY;"
+                "PRAGMA mmap_size=134217728;"
+                "PRAGMA cache_size=-20000;"
+            ),
+            # Take the write lock up front instead of failing with
+            # "database is locked" when a read transaction tries to upgrade
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
 # Configure database for Heroku
 DATABASE_URL = os.getenv('DATABASE_URL')
-if DATABASE_URL:
-    DATABASES['default'] = dj_database_url.config(
-        default=DATABASE_URL,
-        conn_max_age=600,
-        ssl_require=True
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'False') == 'True'
+
+def database_config(url, ssl_require=True):
+    config = dj_database_url.parse(
+        url,
+        # Django's pool replaces persistent connections (requires psycopg 3)
+        conn_max_age=0 if DATABASE_POOL else 600,
+        conn_health_checks=True,
+        ssl_require=ssl_require
     )
+    if DATABASE_POOL:
+        config.setdefault('OPTIONS', {})['pool'] = {
+            "min_size": int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+            "max_size": int(os.getenv('DATABASE_POOL_MAX_SIZE', '8')),
+            "timeout": 10,
+        }
+    return config
+
+if DATABASE_URL:
+    DATABASES['default'] = database_config(DATABASE_URL)
+
+# Read replicas: every other *_DATABASE_URL becomes a database alias, e.g.
+# REPLICA_DATABASE_URL -> "replica", REPLICA_2_DATABASE_URL -> "replica_2".
+# Reads go to a replica unless the request has written recently (see
+# core.routers); writes and migrations always use "default".
+REPLICA_DATABASES = []
+for name, url in sorted(os.environ.items()):
+    if not name.endswith('_DATABASE_URL') or not url:
+        continue
+    alias = name[:-len('_DATABASE_URL')].lower()
+    if alias in ('', 'default'):
+        # DEFAULT_DATABASE_URL would silently replace the primary
+        raise ImproperlyConfigured(f'{name} is reserved; use DATABASE_URL for the primary')
+    DATABASES[alias] = database_config(url, ssl_require=not url.startswith('sqlite'))
+    # Tests run against the primary only
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+
+# How long reads stay on the primary after a write
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '15'))
+
+# Replica pins (and CacheBackend rate limits) are kept in the default cache,
+# which every worker must share: set REDIS_URL (requires the redis package).
+# Without it each worker process has its own in-memory cache.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(1, 'core.routers.ReplicaPinningMiddleware')
 
 
 # Password validation
@@ -152,6 +218,15 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# API admission control (see core.throttling). LocalBackend keeps limits per
+# worker process; CacheBackend shares them through the default cache.
+API_ADMISSION_BACKEND = os.getenv('API_ADMISSION_BACKEND', 'core.throttling.LocalBackend')
+
+# Number of proxies in front of the app that append to X-Forwarded-For.
+# With none, the header is client-supplied and ignored; set NUM_PROXIES=1 on
+# Heroku, whose router appends the real client address.
+NINJA_NUM_PROXIES = int(os.getenv('NUM_PROXIES', '0'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 # For production, specify allowed origins:
@@ -0,0 +1,31 @@
+"""
+WSGI entry point for benchmarks that delays every database query.
+
+Local SQLite answers in microseconds, so a benchmark against it only
+measures CPU. In production each query is a network round trip to
+PostgreSQL, and that waiting is what threads and extra workers overlap.
+BENCH_DB_LATENCY_MS adds that round trip back.
+"""
+
+import os
+import time
+
+from django.db.backends.signals import connection_created
+
+from backend.wsgi import application  # noqa: F401
+
+DELAY = float(os.getenv('BENCH_DB_LATENCY_MS', '0')) / 1000
+
+
+def delay_query(execute, sql, params, many, context):
+    time.sleep(DELAY)
+    return execute(sql, params, many, context)
+
+
+def add_delay(sender, connection, **kwargs):
+    if delay_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(delay_query)
+
+
+if DELAY:
+    connection_created.connect(add_delay)
@@ -0,0 +1,118 @@
+"""
+Compare gunicorn's defaults against the checked-in server profile.
+
+Starts the app twice - once as ``gunicorn backend.wsgi`` with no config and
+once with ``gunicorn.conf.py`` - and for each run reports how long it takes
+until the API answers, and how many requests per second it serves under a
+fixed number of concurrent clients.
+
+Run from the backend directory against a migrated database, e.g.:
+
+    python manage.py migrate
+    python manage.py loaddata ../data_dump.json
+    python benchmarks/server_profile.py --path /api/orders/439-2166731
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    # An empty config file stops gunicorn from loading gunicorn.conf.py
+    "default": ["--config", os.devnull],
+    "tuned": ["--config", str(BACKEND_DIR / "gunicorn.conf.py")],
+}
+
+
+def wait_until_ready(url, timeout):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"Server did not come up within {timeout}s")
+
+
+def run_load(url, clients, duration):
+    deadline = time.perf_counter() + duration
+
+    def client(n):
+        done = errors = 0
+        # Each client thread stands for one user behind a proxy, so it has
+        # its own rate limit bucket (see NUM_PROXIES in bench_profile)
+        headers = {"X-Forwarded-For": f"10.0.0.{n + 1}"}
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(url, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+                done += 1
+            except OSError:
+                errors += 1
+        return done, errors
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+
+    done = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return done / duration, errors
+
+
+def bench_profile(name, args):
+    base = f"http://127.0.0.1:{args.port}"
+    # DEBUG avoids the HTTPS redirect that production settings enforce. The
+    # benchmark plays the proxy in front of the server, so the server trusts
+    # the X-Forwarded-For address each client sends.
+    env = dict(
+        os.environ, DEBUG="True", GUNICORN_ACCESS_LOG="", NUM_PROXIES="1",
+        BENCH_DB_LATENCY_MS=str(args.db_latency),
+    )
+    command = [
+        sys.executable, "-m", "gunicorn", "benchmarks.latency_wsgi:application",
+        "--bind", f"127.0.0.1:{args.port}",
+        *PROFILES[name],
+    ]
+    server = subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup = wait_until_ready(f"{base}/api/test", args.timeout)
+        # Let every worker finish booting before measuring throughput
+        time.sleep(1)
+        rps, errors = run_load(f"{base}{args.path}", args.clients, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+    return startup, rps, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--path', default='/api/test', help='API path to load test')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per profile')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Startup timeout in seconds')
+    parser.add_argument('--db-latency', type=float, default=2.0,
+                        help='Milliseconds added to every query to model a networked database (0 for none)')
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'startup (s)':>14}{'req/s':>12}{'errors':>10}")
+    for name in PROFILES:
+        startup, rps, errors = bench_profile(name, args)
+        print(f"{name:<10}{startup:>14.2f}{rps:>12.1f}{errors:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,77 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
 from .models import Customer, Order, Shipment, ShipmentItem
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses PostgreSQL's table statistics instead of COUNT(*).
+
+    The estimate is only used for an unfiltered changelist, where it
+    describes the whole table. Filters and searches get an exact count, as
+    do other databases and tables small enough that counting is cheap.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+    def estimated_count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return None
+        queryset = self.object_list
+        if queryset.query.where:
+            # Filtered or searched: the planner's guess can be far off
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for a table that has never been analyzed
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows.
+
+    Subclasses should also set list_select_related for any FK shown in
+    list_display, raw_id_fields for FK widgets, and only search indexed
+    fields with exact or prefix lookups, following forward relations only.
+    """
+    paginator = EstimatedCountPaginator
+    # Skip the extra unfiltered COUNT(*) shown next to filtered results
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # The default search splits the term into words that must each
+        # match, which a prefix such as "Canon EOS" never does. Match the
+        # whole term (quotes are optional) against each field instead.
+        search_term = search_term.strip()
+        if len(search_term) > 1 and search_term[0] == search_term[-1] == '"':
+            search_term = search_term[1:-1]
+        search_fields = self.get_search_fields(request)
+        if not search_term or not search_fields:
+            return queryset, False
+
+        condition = Q()
+        for field in search_fields:
+            condition |= Q(**{field: search_term})
+        return queryset.filter(condition), False
+
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ('customer_id', 'username', 'auth0_id')
@@ -17,13 +88,17 @@ class ShipmentItemInline(admin.TabularInline):
     extra = 0
 
 @admin.register(Shipment)
-class ShipmentAdmin(admin.ModelAdmin):
+class ShipmentAdmin(LargeTableAdmin):
     list_display = ('shipment_id', 'order', 'current_status', 'ship_date', 'estimated_delivery')
     list_filter = ('current_status', 'fulfillment_type', 'fulfillment_region')
-    search_fields = ('shipment_id', 'tracking_number', 'order__order_id')
+    list_select_related = ('order',)
+    search_fields = ('shipment_id__startswith', 'tracking_number__exact', 'order__order_id__exact')
+    raw_id_fields = ('order',)
     inlines = [ShipmentItemInline]
 
 @admin.register(ShipmentItem)
-class ShipmentItemAdmin(admin.ModelAdmin):
+class ShipmentItemAdmin(LargeTableAdmin):
     list_display = ('shipment', 'item_name', 'quantity')
-    search_fields = ('item_name', 'shipment__shipment_id')
+    list_select_related = ('shipment',)
+    search_fields = ('item_name__istartswith', 'shipment__shipment_id__exact')
+    raw_id_fields = ('shipment',)
@@ -1,16 +1,26 @@
 from ninja import NinjaAPI, Schema
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
 from typing import List, Optional, Dict
 from datetime import date, datetime
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
+from django.db.models import Count, Prefetch
 from django.http import Http404
 import logging
 import traceback
 from .models import Customer, Order, Shipment, ShipmentItem
+from .throttling import TokenBucketThrottle, limit_concurrency
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Admission control: every client gets a general token bucket; the expensive
+# per-customer endpoints also get their own tighter bucket and a cap on
+# requests in flight, so a client polling them can't starve everything else
+default_throttle = TokenBucketThrottle("20/s", burst=60)
+heavy_throttles = [default_throttle, TokenBucketThrottle("2/s", burst=20, scope="heavy")]
+HEAVY_MAX_IN_FLIGHT = 2
+
 # Initialize the API with more explicit settings
 try:
     api = NinjaAPI(
@@ -18,12 +28,13 @@ try:
         version="1.0.0",
         docs_url="/docs",
         urls_namespace="order_tracker_core_api",
+        throttle=[default_throttle],
     )
     logger.info("API initialized successfully")
 except Exception as e:
     logger.error(f"Error initializing API: {str(e)}\n{traceback.format_exc()}")
     # Still create the API object to avoid import errors
-    api = NinjaAPI(title="Amazon Order Tracker API")
+    api = NinjaAPI(title="Amazon Order Tracker API", throttle=[default_throttle])
 
 # Add a root endpoint
 @api.get("/")
@@ -104,6 +115,92 @@ def get_order_status(shipments):
         return "Delivered"
     return "Processing"
 
+# Sparse fieldsets: ?fields=status,shipments.current_status,shipments.items.item_name
+# selects which schema fields are returned (and loaded from the database).
+# ?compact=true additionally drops null values from the payload.
+NESTED_SCHEMAS = {
+    (OrderSchema, "shipments"): ShipmentSchema,
+    (ShipmentSchema, "items"): ShipmentItemSchema,
+}
+
+SHIPMENT_FIELDS = [f for f in ShipmentSchema.model_fields if f != "items"]
+ITEM_FIELDS = list(ShipmentItemSchema.model_fields)
+
+def parse_fields(fields, schema):
+    """
+    Parse a ?fields= value into a tree like {"status": None, "shipments": {"items": None}}.
+    A None value means every field below that point; None overall means no projection,
+    which includes a value with no field names in it such as "," or " ".
+    """
+    if not fields:
+        return None
+    
+    tree = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node, current = tree, schema
+        parts = path.split(".")
+        for i, name in enumerate(parts):
+            if current is None or name not in current.model_fields:
+                raise HttpError(400, f"Unknown field: {path}")
+            if i == len(parts) - 1:
+                node[name] = None
+            elif name in node and node[name] is None:
+                # The whole sub-object was already requested
+                break
+            else:
+                node = node.setdefault(name, {})
+            current = NESTED_SCHEMAS.get((current, name))
+    return tree or None
+
+def wanted(tree, name):
+    return tree is None or name in tree
+
+def subtree(tree, name):
+    return None if tree is None else tree[name]
+
+def shipment_queryset(tree, with_status=False):
+    # Only select the columns the response needs; items are prefetched in one query
+    columns = [f for f in SHIPMENT_FIELDS if wanted(tree, f)]
+    if with_status:
+        columns.append("current_status")
+    queryset = Shipment.objects.only("order", *columns)
+    if wanted(tree, "items"):
+        item_tree = subtree(tree, "items")
+        item_columns = [f for f in ITEM_FIELDS if wanted(item_tree, f)]
+        queryset = queryset.prefetch_related(
+            Prefetch("items", queryset=ShipmentItem.objects.only("shipment", *item_columns))
+        )
+    return queryset
+
+def serialize_shipment(shipment, tree):
+    data = {f: getattr(shipment, f) for f in SHIPMENT_FIELDS if wanted(tree, f)}
+    if wanted(tree, "items"):
+        item_tree = subtree(tree, "items")
+        data["items"] = [
+            {f: getattr(item, f) for f in ITEM_FIELDS if wanted(item_tree, f)}
+            for item in shipment.items.all()
+        ]
+    return data
+
+def drop_nulls(data):
+    if isinstance(data, dict):
+        return {k: drop_nulls(v) for k, v in data.items() if v is not None}
+    if isinstance(data, list):
+        return [drop_nulls(v) for v in data]
+    return data
+
+def projected_response(request, data, tree, compact):
+    # The full shape goes through the response schema as usual; projected or
+    # compact payloads don't match it, so they are rendered directly
+    if tree is None and not compact:
+        return data
+    if compact:
+        data = drop_nulls(data)
+    return api.create_response(request, data, status=200)
+
 # Endpoints
 @api.get("/customers/lookup", response=CustomerSchema)
 def lookup_customer(request, username: str):
@@ -115,10 +212,11 @@ def lookup_customer(request, username: str):
             "email": customer.email
         }
     except Http404:
-        # For demo purposes, create a customer if not found
-        customer = Customer.objects.create(
+        # For demo purposes, create a customer if not found. get_or_create
+        # checks the primary first, in case a replica hasn't seen it yet.
+        customer, _ = Customer.objects.get_or_create(
             username=username,
-            email=f"{username}@example.com"
+            defaults={"email": f"{username}@example.com"}
         )
         return {
             "customer_id": customer.customer_id,
@@ -126,102 +224,72 @@ def lookup_customer(request, username: str):
             "email": customer.email
         }
 
-@api.get("/customers/{username}/orders", response=List[OrderListSchema])
-def list_customer_orders(request, username: str):
+@decorate_view(limit_concurrency(HEAVY_MAX_IN_FLIGHT))
+@api.get("/customers/{username}/orders", response=List[OrderListSchema], throttle=heavy_throttles)
+def list_customer_orders(request, username: str, fields: Optional[str] = None, compact: bool = False):
+    tree = parse_fields(fields, OrderListSchema)
     customer = get_object_or_404(Customer, username=username)
-    orders = Order.objects.filter(customer=customer)
+    
+    need_status = wanted(tree, "status")
+    need_items = wanted(tree, "items") or wanted(tree, "items_count")
+    # order_id is always loaded: only() with no fields would select every column
+    orders = Order.objects.filter(customer=customer).only(
+        "order_id", *(["order_date"] if wanted(tree, "order_date") else [])
+    )
+    if need_status or need_items:
+        shipments = Shipment.objects.only("order", *(["current_status"] if need_status else []))
+        if need_items:
+            shipments = shipments.prefetch_related(
+                Prefetch("items", queryset=ShipmentItem.objects.only("shipment", "item_name"))
+            )
+        orders = orders.prefetch_related(Prefetch("shipments", queryset=shipments))
     
     result = []
     for order in orders:
-        # Get the shipments for this order
-        shipments = Shipment.objects.filter(order=order)
-        status = get_order_status(shipments)
-        
-        # Get unique items
-        items_set = set()
-        for shipment in shipments:
-            for item in ShipmentItem.objects.filter(shipment=shipment):
-                items_set.add(item.item_name)
-        
-        result.append({
-            "order_id": order.order_id,
-            "order_date": order.order_date,
-            "status": status,
-            "items": list(items_set),
-            "items_count": len(items_set)
-        })
+        data = {f: getattr(order, f) for f in ("order_id", "order_date") if wanted(tree, f)}
+        if need_status:
+            data["status"] = get_order_status(order.shipments.all())
+        if need_items:
+            # Get unique items
+            items_set = set()
+            for shipment in order.shipments.all():
+                for item in shipment.items.all():
+                    items_set.add(item.item_name)
+            if wanted(tree, "items"):
+                data["items"] = list(items_set)
+            if wanted(tree, "items_count"):
+                data["items_count"] = len(items_set)
+        result.append(data)
     
-    return result
+    return projected_response(request, result, tree, compact)
 
 @api.get("/orders/{order_id}", response=OrderSchema)
-def get_order(request, order_id: str):
-    order = get_object_or_404(Order, order_id=order_id)
-    
-    # Get all shipments for this order
-    shipments = Shipment.objects.filter(order=order)
-    shipment_data = []
-    
-    for shipment in shipments:
-        # Get items for this shipment
-        items = ShipmentItem.objects.filter(shipment=shipment)
-        item_data = [{"item_name": item.item_name, "quantity": item.quantity} for item in items]
-        
-        shipment_data.append({
-            "shipment_id": shipment.shipment_id,
-            "tracking_number": shipment.tracking_number,
-            "warehouse_id": shipment.warehouse_id,
-            "fulfillment_region": shipment.fulfillment_region,
-            "zip_code": shipment.zip_code,
-            "address_id": shipment.address_id,
-            "fulfillment_type": shipment.fulfillment_type,
-            "ship_date": shipment.ship_date,
-            "estimated_delivery": shipment.estimated_delivery,
-            "actual_delivery_date": shipment.actual_delivery_date,
-            "current_status": shipment.current_status,
-            "last_scan_location": shipment.last_scan_location,
-            "scan_timestamp": shipment.scan_timestamp,
-            "delivery_attempt_status": shipment.delivery_attempt_status,
-            "delivery_failure_status": shipment.delivery_failure_status,
-            "items": item_data
-        })
+def get_order(request, order_id: str, fields: Optional[str] = None, compact: bool = False):
+    tree = parse_fields(fields, OrderSchema)
+    order = get_object_or_404(Order.objects.only("order_id", "order_date"), order_id=order_id)
     
-    status = get_order_status(shipments)
+    data = {f: getattr(order, f) for f in ("order_id", "order_date") if wanted(tree, f)}
+    if wanted(tree, "status") or wanted(tree, "shipments"):
+        # Get all shipments for this order, with only the columns we return
+        shipment_tree = subtree(tree, "shipments") if wanted(tree, "shipments") else {}
+        shipments = list(
+            shipment_queryset(shipment_tree, with_status=wanted(tree, "status")).filter(order=order)
+        )
+        if wanted(tree, "status"):
+            data["status"] = get_order_status(shipments)
+        if wanted(tree, "shipments"):
+            data["shipments"] = [serialize_shipment(shipment, shipment_tree) for shipment in shipments]
     
-    return {
-        "order_id": order.order_id,
-        "order_date": order.order_date,
-        "status": status,
-        "shipments": shipment_data
-    }
+    return projected_response(request, data, tree, compact)
 
 @api.get("/shipments/{shipment_id}", response=ShipmentSchema)
-def get_shipment(request, shipment_id: str):
-    shipment = get_object_or_404(Shipment, shipment_id=shipment_id)
-    
-    # Get items for this shipment
-    items = ShipmentItem.objects.filter(shipment=shipment)
-    item_data = [{"item_name": item.item_name, "quantity": item.quantity} for item in items]
-    
-    return {
-        "shipment_id": shipment.shipment_id,
-        "tracking_number": shipment.tracking_number,
-        "warehouse_id": shipment.warehouse_id,
-        "fulfillment_region": shipment.fulfillment_region,
-        "zip_code": shipment.zip_code,
-        "address_id": shipment.address_id,
-        "fulfillment_type": shipment.fulfillment_type,
-        "ship_date": shipment.ship_date,
-        "estimated_delivery": shipment.estimated_delivery,
-        "actual_delivery_date": shipment.actual_delivery_date,
-        "current_status": shipment.current_status,
-        "last_scan_location": shipment.last_scan_location,
-        "scan_timestamp": shipment.scan_timestamp,
-        "delivery_attempt_status": shipment.delivery_attempt_status,
-        "delivery_failure_status": shipment.delivery_failure_status,
-        "items": item_data
-    }
+def get_shipment(request, shipment_id: str, fields: Optional[str] = None, compact: bool = False):
+    tree = parse_fields(fields, ShipmentSchema)
+    shipment = get_object_or_404(shipment_queryset(tree), shipment_id=shipment_id)
+    return projected_response(request, serialize_shipment(shipment, tree), tree, compact)
 
-@api.get("/customers/{username}/dashboard", response=DashboardStatsSchema)
+@decorate_view(limit_concurrency(HEAVY_MAX_IN_FLIGHT))
+@api.get("/customers/{username}/dashboard", response=DashboardStatsSchema, throttle=heavy_throttles)
 def get_dashboard_stats(request, username: str):
     customer = get_object_or_404(Customer, username=username)
     
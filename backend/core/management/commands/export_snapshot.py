@@ -0,0 +1,43 @@
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Customer
+from core.snapshot import COLUMNS, arrow_schema, open_writer, require_pyarrow, snapshot_format
+
+class Command(BaseCommand):
+    help = 'Export customers, orders, shipments and items to a columnar snapshot (Parquet or Arrow IPC)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Output path (.parquet, .arrow or .feather)')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows fetched and written per batch')
+        parser.add_argument('--compression', type=str, default='zstd', help='Codec: zstd, lz4 or none; Parquet also takes snappy, gzip and brotli')
+
+    def handle(self, *args, **options):
+        pa = require_pyarrow()
+        output = options['output']
+        batch_size = options['batch_size']
+
+        fmt = snapshot_format(output)
+        if fmt is None:
+            raise CommandError(f'Unknown snapshot format for {output}; use .parquet, .arrow or .feather')
+
+        schema = arrow_schema(pa)
+        lookups = [lookup for _, lookup, _ in COLUMNS]
+        # iterator() streams rows in chunks (a server-side cursor on
+        # PostgreSQL) instead of materializing the whole result
+        rows = Customer.objects.values_list(*lookups).iterator(chunk_size=batch_size)
+
+        self.stdout.write(f'Exporting snapshot to {output}...')
+        total = 0
+        with open_writer(output, fmt, schema, options['compression']) as writer:
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if not chunk:
+                    break
+                columns = [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*chunk), schema)
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+                total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Exported {total} rows'))
@@ -1,21 +1,32 @@
 import csv
 import os
 from datetime import datetime
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from core.models import Customer, Order, Shipment, ShipmentItem
+from core.snapshot import SHIPMENT_COLUMNS, read_batches, snapshot_format
 
 class Command(BaseCommand):
     help = 'Import data from CSV files'
 
     def add_arguments(self, parser):
         parser.add_argument('--customers', type=str, help='Path to customer_logins.csv')
-        parser.add_argument('--orders', type=str, help='Path to amazon_business_tracking_data.csv')
+        parser.add_argument('--orders', type=str, help='Path to amazon_business_tracking_data.csv, or a .parquet/.arrow snapshot')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert when importing a snapshot')
 
     def handle(self, *args, **options):
         customers_file = options.get('customers')
         orders_file = options.get('orders')
         
+        # Snapshots carry customers too, and are loaded with bulk inserts
+        if orders_file and snapshot_format(orders_file):
+            if not os.path.exists(orders_file):
+                self.stdout.write(self.style.ERROR(f'Snapshot file not found: {orders_file}'))
+                return
+            self.import_snapshot(orders_file, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('Data import completed successfully'))
+            return
+        
         if not customers_file or not os.path.exists(customers_file):
             self.stdout.write(self.style.ERROR(f'Customers file not found: {customers_file}'))
             return
@@ -115,4 +126,80 @@ class Command(BaseCommand):
                     )
                     items_count += 1
         
-        self.stdout.write(self.style.SUCCESS(f'Imported {orders_count} orders, {shipments_count} shipments, and {items_count} items')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Imported {orders_count} orders, {shipments_count} shipments, and {items_count} items')) 
+    
+    @transaction.atomic
+    def import_snapshot(self, file_path, batch_size):
+        self.stdout.write('Importing snapshot...')
+        models = (Customer, Order, Shipment, ShipmentItem)
+        before = [model.objects.count() for model in models]
+        # Shipments created by this import; a shipment's item rows may span batches
+        created_shipments = set()
+        
+        for batch in read_batches(file_path, batch_size):
+            data = batch.to_pydict()
+            rows = [dict(zip(data, values)) for values in zip(*data.values())]
+            
+            # Skip shipments that were already in the database, so importing
+            # the same snapshot twice doesn't duplicate their items
+            existing = set(
+                Shipment.objects.filter(shipment_id__in={r['shipment_id'] for r in rows if r['shipment_id']})
+                .values_list('shipment_id', flat=True)
+            ) - created_shipments
+            rows = [r for r in rows if r['shipment_id'] not in existing]
+            
+            # Rows are one per item, so collapse repeated customers/orders/shipments.
+            # Customers without orders and orders without shipments have a
+            # row with empty order or shipment columns.
+            customers = {r['customer_id']: Customer(customer_id=r['customer_id'], username=r['username']) for r in rows}
+            orders = {
+                r['order_id']: Order(order_id=r['order_id'], customer_id=r['customer_id'], order_date=r['order_date'])
+                for r in rows if r['order_id'] is not None
+            }
+            shipments = {
+                r['shipment_id']: Shipment(order_id=r['order_id'], **{f: r[f] for f in SHIPMENT_COLUMNS})
+                for r in rows if r['shipment_id'] is not None and r['shipment_id'] not in created_shipments
+            }
+            items = [
+                ShipmentItem(shipment_id=r['shipment_id'], item_name=r['item_name'], quantity=r['item_quantity'])
+                for r in rows if r['item_name'] is not None
+            ]
+            
+            # ignore_conflicts would also skip a customer whose username is
+            # taken by another customer, leaving their orders pointing at a
+            # customer that doesn't exist
+            self.check_usernames(customers.values())
+            
+            # Customers and orders can span batches or already exist
+            Customer.objects.bulk_create(customers.values(), ignore_conflicts=True)
+            Order.objects.bulk_create(orders.values(), ignore_conflicts=True)
+            Shipment.objects.bulk_create(shipments.values())
+            ShipmentItem.objects.bulk_create(items)
+            created_shipments.update(shipments)
+        
+        customers_count, orders_count, shipments_count, items_count = [
+            model.objects.count() - count for model, count in zip(models, before)
+        ]
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {customers_count} customers, {orders_count} orders, '
+            f'{shipments_count} shipments, and {items_count} items'
+        ))
+    
+    def check_usernames(self, customers):
+        owners = {}
+        for customer in customers:
+            owners.setdefault(customer.username, set()).add(customer.customer_id)
+        existing = Customer.objects.filter(username__in=owners).values_list('username', 'customer_id')
+        for username, customer_id in existing:
+            owners[username].add(customer_id)
+        
+        conflicts = sorted(
+            f'{username} ({", ".join(sorted(ids))})'
+            for username, ids in owners.items() if len(ids) > 1
+        )
+        if conflicts:
+            more = f' and {len(conflicts) - 10} more' if len(conflicts) > 10 else ''
+            raise CommandError(
+                f'Usernames used by more than one customer_id: {"; ".join(conflicts[:10])}{more}. '
+                'Nothing was imported.'
+            )
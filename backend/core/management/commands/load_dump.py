@@ -0,0 +1,209 @@
+import gzip
+import json
+import os
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models.constants import OnConflict
+
+CHUNK_SIZE = 1024 * 1024
+# No fixture object comes near this; a longer undecodable run means the dump is corrupt
+MAX_ELEMENT_SIZE = 64 * 1024 * 1024
+
+
+def iter_json_array(fp, chunk_size=CHUNK_SIZE, max_element_size=MAX_ELEMENT_SIZE):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Only the current element and one read chunk are held in memory, so the
+    size of the dump doesn't matter. An element that still doesn't decode
+    after max_element_size characters is reported as invalid JSON instead
+    of reading the rest of the file into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos == len(buffer):
+            if eof:
+                raise CommandError('Unexpected end of file: dump is not a complete JSON array')
+            buffer = fp.read(chunk_size)
+            pos = 0
+            eof = not buffer
+            continue
+
+        if not started:
+            if buffer[pos] != '[':
+                raise CommandError('Dump must be a JSON array of objects')
+            started = True
+            pos += 1
+            continue
+
+        if buffer[pos] == ']':
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The element is split across chunks; read more and try again
+            if eof:
+                raise CommandError(f'Invalid JSON near offset {pos} of the last chunk')
+            if len(buffer) - pos > max_element_size:
+                raise CommandError(
+                    f'Invalid JSON: no complete element within {max_element_size} characters'
+                )
+            more = fp.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+
+        yield obj
+        pos = end
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+class Command(BaseCommand):
+    help = 'Stream a data_dump.json-style fixture into the database using bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dump', type=str, help='Path to a JSON dump (optionally .gz)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Objects buffered per model before inserting')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to load into')
+        parser.add_argument('--ignore-conflicts', action='store_true', help='Skip rows whose primary key already exists')
+
+    def handle(self, *args, **options):
+        dump_file = options['dump']
+        if not os.path.exists(dump_file):
+            raise CommandError(f'Dump file not found: {dump_file}')
+
+        self.using = options['database']
+        self.batch_size = options['batch_size']
+        self.on_conflict = OnConflict.IGNORE if options['ignore_conflicts'] else None
+        self.pending = {}
+        self.m2m_pending = {}
+        self.counts = {}
+
+        opener = gzip.open if dump_file.endswith('.gz') else open
+        connection = connections[self.using]
+
+        with transaction.atomic(using=self.using):
+            # Like loaddata, defer FK checks so the dump's order doesn't matter
+            with connection.constraint_checks_disabled():
+                with opener(dump_file, 'rt', encoding='utf-8') as f:
+                    for obj in iter_json_array(f):
+                        self.add(obj)
+                for model in self.dependency_order(self.pending):
+                    self.flush(model)
+
+            table_names = [model._meta.db_table for model in self.counts]
+            connection.check_constraints(table_names=table_names)
+            self.reset_sequences(connection)
+
+        # Counting what --ignore-conflicts skipped would take a COUNT(*) per
+        # table, so only the number of rows attempted is reported
+        for model, count in self.counts.items():
+            self.stdout.write(f'  {model._meta.label}: {count}')
+        total = sum(self.counts.values())
+        if self.on_conflict:
+            self.stdout.write(self.style.SUCCESS(
+                f'Processed {total} objects from {dump_file}; rows that were already present were skipped'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Loaded {total} objects from {dump_file}'))
+
+    def add(self, data):
+        for deserialized in serializers.deserialize('python', [data], using=self.using):
+            obj = deserialized.object
+            model = type(obj)
+            self.pending.setdefault(model, []).append(obj)
+            if deserialized.m2m_data:
+                self.m2m_pending.setdefault(model, []).append((obj, deserialized.m2m_data))
+            if len(self.pending[model]) >= self.batch_size:
+                self.flush(model)
+
+    def parents(self, model):
+        return {
+            field.related_model
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is not model
+        }
+
+    def dependency_order(self, models):
+        """Order models so every model comes after the models it references."""
+        ordered = []
+        visiting = set()
+
+        def visit(model):
+            if model in ordered or model in visiting:
+                return
+            visiting.add(model)
+            for parent in self.parents(model):
+                if parent in models:
+                    visit(parent)
+            ordered.append(model)
+
+        for model in list(models):
+            visit(model)
+        return ordered
+
+    def flush(self, model):
+        # Insert whatever is buffered for the models this one points at first
+        for parent in self.dependency_order(self.parents(model)):
+            if self.pending.get(parent):
+                self.flush(parent)
+
+        objs = self.pending.pop(model, [])
+        if not objs:
+            return
+
+        connection = connections[self.using]
+        opts = model._meta
+        # raw=True keeps dumped values such as auto_now_add timestamps intact,
+        # matching what loaddata does through save_base(raw=True)
+        with_pk = [obj for obj in objs if obj.pk is not None]
+        without_pk = [obj for obj in objs if obj.pk is None]
+        for group, fields in (
+            (with_pk, opts.local_concrete_fields),
+            (without_pk, [f for f in opts.local_concrete_fields if not f.primary_key]),
+        ):
+            if not group:
+                continue
+            batch_size = max(connection.ops.bulk_batch_size(fields, group), 1)
+            for start in range(0, len(group), batch_size):
+                try:
+                    model._base_manager.using(self.using)._insert(
+                        group[start:start + batch_size],
+                        fields=fields,
+                        using=self.using,
+                        raw=True,
+                        on_conflict=self.on_conflict,
+                    )
+                except IntegrityError as e:
+                    raise CommandError(
+                        f'{opts.label} rows conflict with rows already in the database ({e}). '
+                        'Use --ignore-conflicts to skip rows that are already present.'
+                    ) from e
+
+        for obj, m2m_data in self.m2m_pending.pop(model, []):
+            for name, values in m2m_data.items():
+                getattr(obj, name).set(values)
+
+        self.counts[model] = self.counts.get(model, 0) + len(objs)
+
+    def reset_sequences(self, connection):
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(self.counts))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for line in sequence_sql:
+                    cursor.execute(line)
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-19 19:23
+
+from django.db import migrations, models
+
+
+# The admin searches item names with istartswith, which PostgreSQL runs as
+# UPPER(item_name) LIKE 'PREFIX%'. Only an expression index with
+# text_pattern_ops serves that; SQLite's LIKE can't use it, so it is skipped.
+UPPER_ITEM_NAME_INDEX = 'core_shipmentitem_item_name_upper_like'
+
+
+def create_item_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {UPPER_ITEM_NAME_INDEX} ON core_shipmentitem (UPPER(item_name) text_pattern_ops)'
+        )
+
+
+def drop_item_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {UPPER_ITEM_NAME_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shipment',
+            name='tracking_number',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.RunPython(create_item_name_index, drop_item_name_index),
+    ]
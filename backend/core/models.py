@@ -24,7 +24,7 @@ class Order(models.Model):
 class Shipment(models.Model):
     shipment_id = models.CharField(max_length=20, primary_key=True)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='shipments')
-    tracking_number = models.CharField(max_length=50)
+    tracking_number = models.CharField(max_length=50, db_index=True)
     warehouse_id = models.CharField(max_length=20)
     fulfillment_region = models.CharField(max_length=50)
     zip_code = models.CharField(max_length=10)
@@ -44,6 +44,7 @@ class Shipment(models.Model):
 
 class ShipmentItem(models.Model):
     shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='items')
+    # Migration 0002 adds an UPPER(item_name) index on PostgreSQL for admin search
     item_name = models.CharField(max_length=100)
     quantity = models.IntegerField()
     
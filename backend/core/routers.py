@@ -0,0 +1,115 @@
+import random
+import threading
+from django.conf import settings
+from django.core.cache import cache
+
+# Per-thread request state: "in_request" is set while ReplicaPinningMiddleware
+# handles a request, "pinned" sends every query to the primary, "wrote"
+# records that the request has written, "replica" is the replica this
+# request reads from and "customer" is the username the request is about
+_state = threading.local()
+
+PIN_COOKIE = 'primary_db_pin'
+PIN_CACHE_PREFIX = 'primary_db_pin:'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def pin_to_primary():
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+def reset(in_request=False):
+    _state.in_request = in_request
+    _state.pinned = False
+    _state.wrote = False
+    _state.replica = None
+    _state.customer = None
+
+
+def customer_pin_key(username):
+    return f'{PIN_CACHE_PREFIX}{username}'
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a read replica and everything else to "default".
+
+    Each request picks one replica at random and reads everything from it,
+    so its queries see a single, consistent copy of the data. Code running
+    outside a request, such as management commands, always uses the primary.
+
+    Once a request writes, its remaining reads go to the primary as well,
+    and ReplicaPinningMiddleware keeps later requests on the primary for
+    REPLICA_PIN_SECONDS so they read that write.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'in_request', False) or is_pinned() or not settings.REPLICA_DATABASES:
+            return 'default'
+        if getattr(_state, 'replica', None) is None:
+            _state.replica = random.choice(settings.REPLICA_DATABASES)
+        return _state.replica
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep unsafe requests, and reads that follow a recent write, on the primary.
+
+    A request that writes pins the customer it names (the ``username`` in
+    the URL or query string) in the cache, so every client reading that
+    customer's data uses the primary until the replicas have caught up.
+    The frontend calls the API cross-origin without credentials, so this
+    can't rely on a cookie. Same-site browser clients such as the admin also
+    get a cookie that pins all of their requests.
+
+    With several workers the pins need a shared cache (see REDIS_URL).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset(in_request=True)
+        if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            pin_to_primary()
+
+        try:
+            response = self.get_response(request)
+            if has_written():
+                if _state.customer:
+                    cache.set(customer_pin_key(_state.customer), True, settings.REPLICA_PIN_SECONDS)
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    secure=not settings.DEBUG,
+                    httponly=True,
+                    samesite='Lax',
+                )
+            return response
+        finally:
+            reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.customer = view_kwargs.get('username') or request.GET.get('username')
+        if _state.customer and cache.get(customer_pin_key(_state.customer)):
+            pin_to_primary()
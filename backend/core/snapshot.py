@@ -0,0 +1,113 @@
+"""
+Columnar snapshots of orders, shipments and items.
+
+A snapshot is one flat table with a row per shipment item, written as
+compressed Parquet or Arrow IPC in fixed-size record batches. Customers
+without orders, orders without shipments and shipments without items get
+a single row whose columns below that level are empty, so importing a
+snapshot restores all of them. pyarrow is only needed by the commands that
+read or write snapshots.
+"""
+
+from django.core.management.base import CommandError
+
+# (column name, Customer lookup, arrow type). Reverse relations are LEFT
+# OUTER JOINs in values_list(), so no customer, order or shipment is dropped.
+COLUMNS = [
+    ('customer_id', 'customer_id', 'string'),
+    ('username', 'username', 'string'),
+    ('order_id', 'orders__order_id', 'string'),
+    ('order_date', 'orders__order_date', 'date32'),
+    ('shipment_id', 'orders__shipments__shipment_id', 'string'),
+    ('tracking_number', 'orders__shipments__tracking_number', 'string'),
+    ('warehouse_id', 'orders__shipments__warehouse_id', 'string'),
+    ('fulfillment_region', 'orders__shipments__fulfillment_region', 'string'),
+    ('zip_code', 'orders__shipments__zip_code', 'string'),
+    ('address_id', 'orders__shipments__address_id', 'string'),
+    ('fulfillment_type', 'orders__shipments__fulfillment_type', 'string'),
+    ('ship_date', 'orders__shipments__ship_date', 'date32'),
+    ('estimated_delivery', 'orders__shipments__estimated_delivery', 'date32'),
+    ('actual_delivery_date', 'orders__shipments__actual_delivery_date', 'date32'),
+    ('current_status', 'orders__shipments__current_status', 'string'),
+    ('last_scan_location', 'orders__shipments__last_scan_location', 'string'),
+    ('scan_timestamp', 'orders__shipments__scan_timestamp', 'timestamp'),
+    ('delivery_attempt_status', 'orders__shipments__delivery_attempt_status', 'string'),
+    ('delivery_failure_status', 'orders__shipments__delivery_failure_status', 'string'),
+    ('item_name', 'orders__shipments__items__item_name', 'string'),
+    ('item_quantity', 'orders__shipments__items__quantity', 'int32'),
+]
+
+# Columns that map straight onto Shipment fields
+SHIPMENT_COLUMNS = [name for name, lookup, _ in COLUMNS if lookup == f'orders__shipments__{name}']
+
+FORMATS = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+
+# Codecs each format can use; "none" writes an uncompressed file
+COMPRESSION = {
+    'parquet': ('none', 'snappy', 'gzip', 'brotli', 'lz4', 'zstd'),
+    'arrow': ('none', 'lz4', 'zstd'),
+}
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise CommandError('Snapshots need pyarrow: pip install pyarrow')
+    return pyarrow
+
+
+def snapshot_format(path):
+    for extension, fmt in FORMATS.items():
+        if path.endswith(extension):
+            return fmt
+    return None
+
+
+def arrow_schema(pa):
+    types = {
+        'string': pa.string(),
+        'date32': pa.date32(),
+        'int32': pa.int32(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(name, types[type_name]) for name, _, type_name in COLUMNS])
+
+
+def open_writer(path, fmt, schema, compression):
+    pa = require_pyarrow()
+    compression = compression.lower()
+    if compression not in COMPRESSION[fmt]:
+        raise CommandError(
+            f'Unsupported compression {compression!r} for {fmt} snapshots; '
+            f'use one of: {", ".join(COMPRESSION[fmt])}'
+        )
+    if compression == 'none':
+        compression = None
+    elif not pa.Codec.is_available(compression):
+        raise CommandError(f'This pyarrow build has no {compression} codec')
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema, compression=compression)
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    return pa.ipc.new_file(path, schema, options=options)
+
+
+def read_batches(path, batch_size):
+    """Yield the snapshot's record batches without loading the whole file."""
+    pa = require_pyarrow()
+    if snapshot_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+        return
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
@@ -1,3 +1,591 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from unittest import mock
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+import ninja.conf
+from core import routers, throttling
+from core.api import default_throttle
+from core.admin import EstimatedCountPaginator
+from core.management.commands.load_dump import Command as LoadDumpCommand, iter_json_array
+from core.models import Customer, Order, Shipment, ShipmentItem
+from core.snapshot import SHIPMENT_COLUMNS
 
-# Create your tests here.
+
+def create_order(shipments=3):
+    """Create a customer with one order of `shipments` shipments, one item each."""
+    customer = Customer.objects.create(customer_id='CUST-1', username='user1')
+    order = Order.objects.create(order_id='ORD-1', customer=customer, order_date='2024-01-01')
+    for n in range(shipments):
+        shipment = Shipment.objects.create(
+            shipment_id=f'SHIP-{n}', order=order, tracking_number=f'TRK-{n}',
+            warehouse_id='WH-1', fulfillment_region='West', zip_code='98101',
+            address_id='ADDR-1', fulfillment_type='FBA', ship_date='2024-01-02',
+            estimated_delivery='2024-01-05', current_status='Delivered',
+            last_scan_location='Seattle',
+        )
+        ShipmentItem.objects.create(shipment=shipment, item_name=f'Item {n}', quantity=n + 1)
+    return order
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    data = [
+        {"model": "core.customer", "pk": "CUST-1", "fields": {"username": "user1", "email": None}},
+        {"model": "core.order", "pk": "ORD-1", "fields": {"customer": "CUST-1", "note": "a, [b] {c}"}},
+        {"model": "core.shipmentitem", "pk": 1, "fields": {"item_name": "Café \"mug\"", "quantity": 2}},
+    ]
+
+    def test_indented_dump_with_various_chunk_sizes(self):
+        text = json.dumps(self.data, indent=2)
+        # Chunk sizes of 1 and 2 split every token, separator and escape
+        for chunk_size in (1, 2, 3, 7, 64, len(text), len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), self.data)
+
+    def test_compact_dump_with_every_chunk_size(self):
+        text = json.dumps(self.data)
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), self.data)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '), 1)), [])
+
+    def test_not_an_array(self):
+        with self.assertRaises(CommandError):
+            list(iter_json_array(io.StringIO('{"model": "core.customer"}')))
+
+    def test_truncated_dump(self):
+        text = json.dumps(self.data)[:-10]
+        with self.assertRaises(CommandError):
+            list(iter_json_array(io.StringIO(text), 16))
+
+    def test_corrupt_element_stops_reading_early(self):
+        text = '[{"model": ' + 'x' * 10000 + ']'
+        fp = io.StringIO(text)
+        with self.assertRaisesMessage(CommandError, 'no complete element'):
+            list(iter_json_array(fp, chunk_size=100, max_element_size=1000))
+        self.assertLess(fp.tell(), 2000)
+
+
+
+class LoadDumpTests(TestCase):
+    # Children before parents, the opposite of the order they must be inserted in
+    dump = [
+        {"model": "core.shipmentitem", "pk": 500, "fields": {"shipment": "SHIP-1", "item_name": "Mug", "quantity": 2}},
+        {"model": "core.shipment", "pk": "SHIP-1", "fields": {
+            "order": "ORD-1", "tracking_number": "TRK-1", "warehouse_id": "WH-1",
+            "fulfillment_region": "West", "zip_code": "98101", "address_id": "ADDR-1",
+            "fulfillment_type": "FBA", "ship_date": "2024-01-02", "estimated_delivery": "2024-01-05",
+            "actual_delivery_date": None, "current_status": "Delivered", "last_scan_location": "Seattle",
+            "scan_timestamp": None, "delivery_attempt_status": None, "delivery_failure_status": None,
+        }},
+        {"model": "core.order", "pk": "ORD-1", "fields": {
+            "customer": "CUST-1", "order_date": "2024-01-01", "created_at": "2020-01-01T00:00:00Z",
+        }},
+        {"model": "core.customer", "pk": "CUST-1", "fields": {
+            "username": "user1", "auth0_id": None, "email": None, "created_at": "2020-01-01T00:00:00Z",
+        }},
+    ]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'dump.json')
+        with open(self.path, 'w') as f:
+            json.dump(self.dump, f)
+
+    def load(self, *args):
+        out = io.StringIO()
+        call_command('load_dump', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_dependency_order(self):
+        models = {ShipmentItem, Shipment, Customer, Order}
+        self.assertEqual(
+            LoadDumpCommand().dependency_order(models), [Customer, Order, Shipment, ShipmentItem]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.load()
+        tables = [
+            q['sql'].split('"')[1] for q in queries if q['sql'].startswith('INSERT INTO')
+        ]
+        self.assertEqual(tables, ['core_customer', 'core_order', 'core_shipment', 'core_shipmentitem'])
+
+    def test_keeps_dumped_values(self):
+        output = self.load()
+        self.assertIn('Loaded 4 objects', output)
+        customer = Customer.objects.get(pk='CUST-1')
+        # auto_now_add isn't applied to loaded rows
+        self.assertEqual(customer.created_at.isoformat(), '2020-01-01T00:00:00+00:00')
+        item = ShipmentItem.objects.get(pk=500)
+        self.assertEqual((item.shipment.order.customer, item.quantity), (customer, 2))
+
+    def test_resets_sequences(self):
+        self.load()
+        item = ShipmentItem.objects.create(shipment_id='SHIP-1', item_name='Pen', quantity=1)
+        self.assertGreater(item.pk, 500)
+
+    def test_existing_rows(self):
+        self.load()
+        with self.assertRaisesMessage(CommandError, '--ignore-conflicts'):
+            self.load()
+
+        ShipmentItem.objects.all().delete()
+        output = self.load('--ignore-conflicts')
+        self.assertIn('Processed 4 objects', output)
+        self.assertEqual(ShipmentItem.objects.get().item_name, 'Mug')
+        self.assertEqual(Customer.objects.count(), 1)
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_order()
+
+    def postgresql(self, reltuples):
+        """Patch the paginator's connection to look like PostgreSQL."""
+        connection = mock.MagicMock(vendor='postgresql')
+        connection.ops.quote_name = lambda name: f'"{name}"'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (reltuples,)
+        patcher = mock.patch('core.admin.connections', {'default': connection})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return cursor
+
+    def test_unfiltered_table_uses_reltuples(self):
+        cursor = self.postgresql(2500000.0)
+        paginator = EstimatedCountPaginator(Shipment.objects.order_by('pk'), 100)
+        self.assertEqual(paginator.count, 2500000)
+        sql, params = cursor.execute.call_args.args
+        self.assertIn('pg_class', sql)
+        self.assertEqual(params, ['"core_shipment"'])
+
+    def test_filtered_queryset_counts_exactly(self):
+        cursor = self.postgresql(2500000.0)
+        queryset = Shipment.objects.filter(current_status='Delivered', shipment_id__lt='SHIP-2').order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 2)
+        cursor.execute.assert_not_called()
+
+    def test_admin_search_counts_exactly(self):
+        cursor = self.postgresql(2500000.0)
+        model_admin = site._registry[Shipment]
+        request = RequestFactory().get('/admin/core/shipment/', {'q': 'SHIP-1'})
+        queryset, _ = model_admin.get_search_results(request, Shipment.objects.all(), 'SHIP-1')
+        self.assertEqual(EstimatedCountPaginator(queryset.order_by('pk'), 100).count, 1)
+        cursor.execute.assert_not_called()
+
+    def test_small_or_unanalyzed_table_counts_exactly(self):
+        for reltuples in (500.0, -1.0):
+            with self.subTest(reltuples=reltuples):
+                self.postgresql(reltuples)
+                self.assertEqual(EstimatedCountPaginator(Shipment.objects.order_by('pk'), 100).count, 3)
+
+    def test_other_databases_count_exactly(self):
+        paginator = EstimatedCountPaginator(Shipment.objects.order_by('pk'), 100)
+        self.assertIsNone(paginator.estimated_count())
+        self.assertEqual(paginator.count, 3)
+
+
+
+class LargeTableAdminSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        order = create_order(shipments=1)
+        shipment = order.shipments.get()
+        for name in ('Canon EOS R5', 'Canon EOS 90D', 'Canon PIXMA Printer', 'Nikon Z6'):
+            ShipmentItem.objects.create(shipment=shipment, item_name=name, quantity=1)
+
+    def search(self, model, term):
+        model_admin = site._registry[model]
+        request = RequestFactory().get('/', {'q': term})
+        queryset, may_have_duplicates = model_admin.get_search_results(request, model.objects.all(), term)
+        self.assertFalse(may_have_duplicates)
+        return queryset
+
+    def test_multi_word_prefix(self):
+        for term in ('Canon EOS', 'canon eos', ' "Canon EOS" '):
+            with self.subTest(term=term):
+                names = self.search(ShipmentItem, term).values_list('item_name', flat=True)
+                self.assertCountEqual(names, ['Canon EOS R5', 'Canon EOS 90D'])
+        self.assertEqual(self.search(ShipmentItem, 'canon').count(), 3)
+        self.assertFalse(self.search(ShipmentItem, 'EOS').exists())
+
+    def test_exact_and_related_fields(self):
+        self.assertEqual(self.search(ShipmentItem, 'SHIP-0').count(), 5)
+        self.assertEqual(list(self.search(Shipment, 'TRK-0').values_list('pk', flat=True)), ['SHIP-0'])
+        self.assertEqual(self.search(Shipment, 'ORD-1').count(), 1)
+        self.assertEqual(self.search(Shipment, '').count(), 1)
+
+    def test_changelist(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.get('/admin/core/shipmentitem/', {'q': 'Canon EOS'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_order(shipments=2)
+
+    def setUp(self):
+        # Start every test with empty rate limit buckets
+        throttling._backend = None
+
+    def get(self, path, **params):
+        return self.client.get(f'/api{path}', params, secure=True)
+
+    def test_no_projection(self):
+        response = self.get('/shipments/SHIP-0')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn('last_scan_location', data)
+        self.assertIsNone(data['actual_delivery_date'])
+        self.assertEqual(data['items'], [{'item_name': 'Item 0', 'quantity': 1}])
+
+    def test_empty_fields_means_no_projection(self):
+        full = self.get('/orders/ORD-1').json()
+        for fields in (',', ' ', ' , ,'):
+            with self.subTest(fields=fields):
+                response = self.get('/orders/ORD-1', fields=fields)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), full)
+        response = self.get('/customers/user1/orders', fields=',')
+        self.assertEqual(set(response.json()[0]), {'order_id', 'order_date', 'status', 'items', 'items_count'})
+
+    def test_nested_paths(self):
+        response = self.get('/orders/ORD-1', fields='status,shipments.tracking_number,shipments.items.item_name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'Delivered',
+            'shipments': [
+                {'tracking_number': 'TRK-0', 'items': [{'item_name': 'Item 0'}]},
+                {'tracking_number': 'TRK-1', 'items': [{'item_name': 'Item 1'}]},
+            ],
+        })
+
+    def test_whole_sub_object(self):
+        response = self.get('/orders/ORD-1', fields='shipments.items,shipments.items.quantity')
+        self.assertEqual(response.json()['shipments'][0], {'items': [{'item_name': 'Item 0', 'quantity': 1}]})
+
+    def test_unknown_field(self):
+        for fields in ('nope', 'shipments.nope', 'status.items', 'shipments.items.item_name.x'):
+            with self.subTest(fields=fields):
+                response = self.get('/orders/ORD-1', fields=fields)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Unknown field', response.json()['detail'])
+
+    def test_compact(self):
+        data = self.get('/shipments/SHIP-0', compact='true').json()
+        self.assertNotIn('actual_delivery_date', data)
+        self.assertNotIn('scan_timestamp', data)
+        self.assertEqual(data['tracking_number'], 'TRK-0')
+
+        data = self.get('/shipments/SHIP-0', fields='tracking_number,scan_timestamp', compact='true').json()
+        self.assertEqual(data, {'tracking_number': 'TRK-0'})
+
+    def test_narrowed_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/shipments/SHIP-0', fields='tracking_number')
+        self.assertEqual(response.json(), {'tracking_number': 'TRK-0'})
+        shipment_queries = [q['sql'] for q in queries if 'core_shipment' in q['sql']]
+        self.assertEqual(len(shipment_queries), 1)
+        self.assertIn('"tracking_number"', shipment_queries[0])
+        self.assertNotIn('"last_scan_location"', shipment_queries[0])
+        # Items weren't requested, so they aren't fetched at all
+        self.assertFalse(any('core_shipmentitem' in q['sql'] for q in queries))
+
+        for fields in ('status', 'items_count'):
+            with self.subTest(fields=fields):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.get('/customers/user1/orders', fields=fields)
+                self.assertEqual(set(response.json()[0]), {fields})
+                order_queries = [q['sql'] for q in queries if 'FROM "core_order"' in q['sql']]
+                self.assertEqual(len(order_queries), 1)
+                self.assertNotIn('"order_date"', order_queries[0])
+                self.assertNotIn('"created_at"', order_queries[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get('/orders/ORD-1', fields='shipments.items.item_name')
+        item_queries = [q['sql'] for q in queries if 'FROM "core_shipmentitem"' in q['sql']]
+        self.assertEqual(len(item_queries), 1)
+        self.assertIn('"item_name"', item_queries[0])
+        self.assertNotIn('"quantity"', item_queries[0])
+
+
+@override_settings(REPLICA_DATABASES=['replica', 'replica_2', 'replica_3'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        routers.reset(in_request=True)
+        self.addCleanup(routers.reset)
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_one_replica_per_request(self):
+        with mock.patch('core.routers.random.choice', side_effect=['replica_2', 'replica_3']) as choice:
+            aliases = {self.router.db_for_read(Shipment) for _ in range(10)}
+            self.assertEqual(aliases, {'replica_2'})
+            # The middleware resets the state between requests
+            routers.reset(in_request=True)
+            self.assertEqual(self.router.db_for_read(Order), 'replica_3')
+        self.assertEqual(choice.call_count, 2)
+
+    def test_outside_a_request_uses_the_primary(self):
+        routers.reset()
+        self.assertEqual(self.router.db_for_read(Shipment), 'default')
+
+    def test_reads_after_a_write_use_the_primary(self):
+        self.assertIn(self.router.db_for_read(Shipment), settings.REPLICA_DATABASES)
+        self.assertEqual(self.router.db_for_write(Shipment), 'default')
+        self.assertEqual(self.router.db_for_read(Shipment), 'default')
+        self.assertTrue(routers.has_written())
+
+
+
+class RecordingRouter(routers.PrimaryReplicaRouter):
+    """Record where reads would go while running them on the test database."""
+    reads = []
+
+    def db_for_read(self, model, **hints):
+        self.reads.append(super().db_for_read(model, **hints))
+        return 'default'
+
+
+@override_settings(
+    REPLICA_DATABASES=['replica'],
+    DATABASE_ROUTERS=['core.tests.RecordingRouter'],
+    MIDDLEWARE=[
+        *settings.MIDDLEWARE[:1], 'core.routers.ReplicaPinningMiddleware', *settings.MIDDLEWARE[1:]
+    ],
+)
+class ReplicaPinningMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_order()
+
+    def setUp(self):
+        throttling._backend = None
+        cache.clear()
+        RecordingRouter.reads.clear()
+
+    def reads(self, client, path, **params):
+        RecordingRouter.reads.clear()
+        response = client.get(f'/api{path}', params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return set(RecordingRouter.reads)
+
+    def test_reads_use_the_replica(self):
+        self.assertEqual(self.reads(self.client, '/customers/user1/orders'), {'replica'})
+        self.assertEqual(self.reads(self.client, '/customers/lookup', username='user1'), {'replica'})
+        self.assertNotIn(routers.PIN_COOKIE, self.client.cookies)
+
+    def test_write_pins_the_customer(self):
+        # The lookup creates the customer, then a client without cookies
+        # (like the cross-origin frontend) reads that customer's data
+        self.reads(Client(), '/customers/lookup', username='newuser')
+        self.assertTrue(Customer.objects.filter(username='newuser').exists())
+        self.assertEqual(self.reads(Client(), '/customers/newuser/orders'), {'default'})
+        self.assertEqual(self.reads(Client(), '/customers/newuser/dashboard'), {'default'})
+        # Other customers still read from the replica
+        self.assertEqual(self.reads(Client(), '/customers/user1/orders'), {'replica'})
+
+        cache.delete(routers.customer_pin_key('newuser'))
+        self.assertEqual(self.reads(Client(), '/customers/newuser/orders'), {'replica'})
+
+    def test_write_sets_the_pin_cookie(self):
+        response = self.client.get('/api/customers/lookup', {'username': 'newuser'}, secure=True)
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie['httponly'])
+        # The cookie pins every request from this client, whichever customer it names
+        self.assertEqual(self.reads(self.client, '/customers/user1/orders'), {'default'})
+        self.assertEqual(self.reads(self.client, '/orders/ORD-1'), {'default'})
+
+        self.client.cookies.pop(routers.PIN_COOKIE)
+        self.assertEqual(self.reads(self.client, '/orders/ORD-1'), {'replica'})
+
+class AdmissionControlTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_order()
+
+    def setUp(self):
+        throttling._backend = None
+
+    def get(self, path, **extra):
+        return self.client.get(f'/api{path}', secure=True, **extra)
+
+    def test_rate_limit(self):
+        # Freeze the clock so no tokens are refilled during the test
+        with mock.patch.object(throttling.time, 'monotonic', return_value=1000.0):
+            for _ in range(60):
+                self.assertEqual(self.get('/test').status_code, 200)
+            response = self.get('/test')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '1')
+            # Other clients have their own bucket
+            self.assertEqual(self.get('/test', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_heavy_scope(self):
+        with mock.patch.object(throttling.time, 'monotonic', return_value=1000.0):
+            for _ in range(20):
+                self.assertEqual(self.get('/customers/user1/dashboard').status_code, 200)
+            self.assertEqual(self.get('/customers/user1/dashboard').status_code, 429)
+            # The tighter bucket doesn't eat into the default one
+            self.assertEqual(self.get('/orders/ORD-1').status_code, 200)
+
+    def test_in_flight_cap(self):
+        backend = throttling.get_backend()
+        key = 'in_flight:api/customers/<username>/orders'
+        for _ in range(2):
+            self.assertTrue(backend.acquire(key, 2))
+        response = self.get('/customers/user1/orders')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+        backend.release(key)
+        self.assertEqual(self.get('/customers/user1/orders').status_code, 200)
+        # The finished request gave its slot back
+        self.assertTrue(backend.acquire(key, 2))
+
+    def test_client_identity_ignores_forwarded_for(self):
+        self.assertEqual(ninja.conf.settings.NUM_PROXIES, 0)
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(default_throttle.get_ident(request), '10.0.0.1')
+        # Forged addresses all share the caller's bucket
+        with mock.patch.object(throttling.time, 'monotonic', return_value=1000.0):
+            statuses = [
+                self.get('/test', HTTP_X_FORWARDED_FOR=f'1.2.3.{n}').status_code
+                for n in range(61)
+            ]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_client_identity_behind_proxy(self):
+        request = RequestFactory().get(
+            '/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4, 5.6.7.8'
+        )
+        with mock.patch.object(ninja.conf.settings, 'NUM_PROXIES', 1):
+            # The proxy appended the address it saw; earlier entries are client-supplied
+            self.assertEqual(default_throttle.get_ident(request), '5.6.7.8')
+
+
+class ThrottlingBackendTests(SimpleTestCase):
+    def test_local_backend_drops_refilled_buckets(self):
+        backend = throttling.LocalBackend()
+        with mock.patch.object(throttling.time, 'monotonic', return_value=1000.0):
+            self.assertEqual(backend.consume('a', 1, 2), 0)
+            self.assertEqual(backend.consume('a', 1, 2), 0)
+            self.assertEqual(backend.consume('a', 1, 2), 1)
+            backend.consume('b', 1, 2)
+        # 'a' is empty and full again after 2s, 'b' after 1s
+        backend.prune(1001.5)
+        self.assertEqual(list(backend.buckets), ['a'])
+        backend.prune(1002)
+        self.assertEqual(backend.buckets, {})
+
+    def test_local_backend_release_drops_idle_routes(self):
+        backend = throttling.LocalBackend()
+        self.assertTrue(backend.acquire('route', 1))
+        self.assertFalse(backend.acquire('route', 1))
+        backend.release('route')
+        self.assertEqual(backend.in_flight, {})
+
+    def test_cache_backend_counter_expiring_after_add(self):
+        backend = throttling.CacheBackend()
+        backend.cache = mock.Mock()
+        backend.cache.incr.side_effect = ValueError
+        backend.cache.add.side_effect = [False, True]
+        self.assertTrue(backend.acquire('route', 2))
+        backend.cache.add.assert_called_with('route', 1, backend.timeout)
+
+        # Another request recreated the counter first
+        backend.cache.incr.side_effect = [ValueError, 3]
+        backend.cache.add.side_effect = [True, False]
+        self.assertFalse(backend.acquire('route', 2))
+        backend.cache.decr.assert_called_once_with('route')
+
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class SnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        order = create_order()
+        # A shipment without items, an order without shipments and a
+        # customer without orders must all survive a round trip
+        Shipment.objects.create(
+            shipment_id='SHIP-9', order=order, tracking_number='TRK-9',
+            warehouse_id='WH-2', fulfillment_region='East', zip_code='10001',
+            address_id='ADDR-2', fulfillment_type='Expedited', ship_date='2024-01-03',
+            estimated_delivery='2024-01-04', actual_delivery_date='2024-01-04',
+            current_status='Failed', last_scan_location='New York, NY',
+            scan_timestamp=datetime(2024, 1, 4, 9, 30, 15, 250000, tzinfo=timezone.utc),
+            delivery_attempt_status='Second Attempt', delivery_failure_status='Address not found',
+        )
+        Order.objects.create(order_id='ORD-2', customer=order.customer, order_date='2024-02-01')
+        Customer.objects.create(customer_id='CUST-2', username='user2')
+
+    def database_state(self):
+        return (
+            list(Customer.objects.order_by('pk').values_list('customer_id', 'username')),
+            list(Order.objects.order_by('pk').values_list('order_id', 'customer_id', 'order_date')),
+            list(Shipment.objects.order_by('pk').values_list('order_id', *SHIPMENT_COLUMNS)),
+            sorted(ShipmentItem.objects.values_list('shipment_id', 'item_name', 'quantity')),
+        )
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def export(self, name, **options):
+        path = os.path.join(self.dir, name)
+        call_command('export_snapshot', path, stdout=io.StringIO(), **options)
+        return path
+
+    def test_round_trip(self):
+        expected = self.database_state()
+        self.assertIn(('ORD-2', 'CUST-1', date(2024, 2, 1)), expected[1])
+        for name, compression in (('s.parquet', 'snappy'), ('s.arrow', 'lz4'), ('s.feather', 'none')):
+            with self.subTest(name=name, compression=compression):
+                path = self.export(name, compression=compression)
+                Customer.objects.all().delete()
+                call_command('import_data', orders=path, stdout=io.StringIO())
+                self.assertEqual(self.database_state(), expected)
+
+    def test_import_twice(self):
+        path = self.export('s.parquet', batch_size=2)
+        expected = self.database_state()
+        call_command('import_data', orders=path, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(self.database_state(), expected)
+
+    def test_unsupported_compression(self):
+        for name, compression in (('s.feather', 'snappy'), ('s.arrow', 'gzip'), ('s.parquet', 'lzma')):
+            with self.subTest(name=name, compression=compression):
+                with self.assertRaisesMessage(CommandError, f'Unsupported compression {compression!r}'):
+                    self.export(name, compression=compression)
+                self.assertFalse(os.path.exists(os.path.join(self.dir, name)))
+
+    def test_username_conflict(self):
+        path = self.export('s.parquet')
+        Customer.objects.all().delete()
+        Customer.objects.create(customer_id='CUST-9', username='user1')
+        with self.assertRaisesMessage(CommandError, 'user1 (CUST-1, CUST-9)'):
+            call_command('import_data', orders=path, stdout=io.StringIO())
+        self.assertFalse(Order.objects.exists())
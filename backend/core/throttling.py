@@ -0,0 +1,170 @@
+import threading
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from ninja.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+
+class LocalBackend:
+    """
+    Keep admission state in process memory.
+
+    Limits apply per gunicorn worker, which needs no extra infrastructure
+    and is enough to stop one client from tying up a worker's threads.
+    """
+    # How often buckets that have refilled are dropped, in seconds
+    prune_interval = 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (tokens, updated, time the bucket is full again)
+        self.buckets = {}
+        self.in_flight = {}
+        self.next_prune = time.monotonic() + self.prune_interval
+
+    def consume(self, key, rate, capacity):
+        """Take one token; return 0 if allowed, else seconds until the next token."""
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_prune:
+                self.prune(now)
+            tokens, updated, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            return wait
+
+    def prune(self, now):
+        # A full bucket behaves exactly like a missing one, so clients that
+        # stopped sending requests don't keep an entry forever
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        self.next_prune = now + self.prune_interval
+
+    def acquire(self, key, limit):
+        with self.lock:
+            if self.in_flight.get(key, 0) >= limit:
+                return False
+            self.in_flight[key] = self.in_flight.get(key, 0) + 1
+            return True
+
+    def release(self, key):
+        with self.lock:
+            self.in_flight[key] -= 1
+            if not self.in_flight[key]:
+                del self.in_flight[key]
+
+
+class CacheBackend:
+    """
+    Keep admission state in a Django cache (e.g. Redis) shared by all workers.
+
+    Token buckets are read-modify-write, so concurrent requests from the same
+    client may occasionally both get the last token; in-flight counters use
+    the cache's atomic incr/decr.
+    """
+
+    def __init__(self, alias='default', timeout=300):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def consume(self, key, rate, capacity):
+        now = time.time()
+        tokens, updated = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self.cache.set(key, (tokens - 1, now), self.timeout)
+            return 0
+        self.cache.set(key, (tokens, now), self.timeout)
+        return (1 - tokens) / rate
+
+    def acquire(self, key, limit):
+        # The timeout stops a counter leaked by a killed worker from
+        # blocking the route forever
+        self.cache.add(key, 0, self.timeout)
+        try:
+            in_flight = self.cache.incr(key)
+        except ValueError:
+            # The counter expired between add() and incr(); start a new one
+            # that counts this request, unless another request just did
+            if self.cache.add(key, 1, self.timeout):
+                return True
+            in_flight = self.cache.incr(key)
+        if in_flight > limit:
+            self.cache.decr(key)
+            return False
+        return True
+
+    def release(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            # The counter expired while the request was running
+            pass
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.API_ADMISSION_BACKEND)()
+    return _backend
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Per-client token bucket: ``rate`` tokens per period, bursts up to ``burst``.
+
+    Each scope has its own buckets, so a tight limit on an expensive route
+    doesn't eat into the budget for cheap ones.
+    """
+
+    def __init__(self, rate, burst=None, scope="default"):
+        count, period = rate.split("/")
+        self.rate = int(count) / PERIODS[period]
+        self.capacity = burst or int(count)
+        self.scope = scope
+        # Throttle instances are shared by every thread serving the route
+        self.local = threading.local()
+
+    def allow_request(self, request):
+        key = f"throttle:{self.scope}:{self.get_ident(request)}"
+        self.local.wait = get_backend().consume(key, self.rate, self.capacity)
+        return self.local.wait == 0
+
+    def wait(self):
+        return getattr(self.local, 'wait', None)
+
+
+def limit_concurrency(max_in_flight):
+    """
+    Cap the number of requests a route serves at once; shed the rest with 503.
+
+    Use with ninja's ``decorate_view`` so the cap is checked before the
+    request does any work.
+    """
+    def decorator(run):
+        @wraps(run)
+        def wrapper(request, *args, **kwargs):
+            key = f"in_flight:{request.resolver_match.route}"
+            backend = get_backend()
+            if not backend.acquire(key, max_in_flight):
+                response = JsonResponse({"detail": "Server busy, try again shortly."}, status=503)
+                response["Retry-After"] = "1"
+                return response
+            try:
+                return run(request, *args, **kwargs)
+            finally:
+                backend.release(key)
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+"""
+Gunicorn server profile for the order tracker backend.
+
+Gunicorn picks this file up automatically when started from the backend
+directory (see the Procfile). Every value can be overridden through the
+environment so the same profile works on Heroku dynos and locally.
+"""
+
+import multiprocessing
+import os
+
+# Bind to the port Heroku assigns, falling back to the usual local port
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Worker model: a few processes, each with a small thread pool. The API is
+# mostly waiting on the database, so threads give us concurrency without
+# paying for a full Python process per request. Heroku sets WEB_CONCURRENCY
+# per dyno size; otherwise size from the CPUs this process may run on, capped
+# so a large host doesn't open dozens of database connections
+# (workers x threads connections at most).
+try:
+    available_cpus = len(os.sched_getaffinity(0))
+except AttributeError:
+    available_cpus = multiprocessing.cpu_count()
+workers = int(os.getenv('WEB_CONCURRENCY', min(available_cpus, 4)))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Import Django once in the master and fork the workers from it, which
+# shortens boot time and lets workers share memory pages.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Recycle workers periodically to cap memory growth; the jitter keeps them
+# from all restarting at the same moment.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# Heroku's router gives up after 30 seconds
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '20'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Log to stdout/stderr so the platform collects everything
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # With preload_app the master imports Django before forking. Make sure
+    # no database connection opened during import is shared by the workers.
+    from django.db import connections
+    connections.close_all()
@@ -184,9 +184,11 @@ export const OrderProvider = ({ children }: OrderProviderProps) => {
     
     if (isUserLoading || !user) return;
     
-    loadCustomer();
-    loadOrders();
-    loadDashboardStats();
+    // The lookup creates new customers, so load their data once it's done
+    loadCustomer().then(() => {
+      loadOrders();
+      loadDashboardStats();
+    });
   }, [user, isUserLoading]);
   
   // Context value